@@ -1,21 +1,29 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import math
 import re
 from builtins import str
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 
-import nltk
 import tkinter as tk
 
-# nltk.download('punkt')
 from pathlib import Path
 from tkinter import ttk
 from tkinter import filedialog as fd
 from tkinter.scrolledtext import ScrolledText
-from nltk import bigrams
-from nltk.lm.preprocessing import pad_both_ends
 
 k = 0.5
+insertChunkLines = 5000  # lines written to a text widget per event loop turn
+analysisPollMs = 50
+analysisExecutor = ThreadPoolExecutor(max_workers=1)  # counting runs off the Tk thread
+analysisFuture = None
+word_regex = re.compile(r"\w+")
+sentence_regex = re.compile(
+    r"(?:(?<=[.!?])|(?<=[.!?][\"'”’)]))\s+"
+)  # split after sentence-ending punctuation (and closing quotes)
 root = tk.Tk()
 
 filename = tk.StringVar()
@@ -31,17 +39,30 @@ textvariable_numOfUniqueWords = tk.StringVar()
 textvariable_numOfUniqueWords.set("")
 
 numOfUniqueWords = 0
+numOfAllWords = 0  # words plus one <s> and one </s> per sentence
 
 sentences = []
+sentenceWords = []  # words of each sentence
 
 allWords = []
 uniqueWords = set()
+uniqueWordsList = ()  # uniqueWords ordered by occurence, for stable tables
 word_occurence_dict = {}
 
-allBigrams = []
 uniqueBigrams = set()
 bigram_occurence_dict = {}
 
+pendingInserts = []  # ids of scheduled fills, cancelled by a new analysis
+tab7Pending = False  # the V x V table is only built once its tab is shown
+
+unigram_prob_dict = {}
+unigram_prob_smooth_dict = {}
+unseen_unigram_prob_smooth = 0
+bigram_prob_dict = {}
+bigram_prob_smooth_dict = {}
+unseen_bigram_prob_smooth_dict = {}  # smoothed P(w|context) of unseen bigrams
+unseen_context_prob_smooth = 0
+
 
 def select_file():
     filetypes = (("text files", "*.txt"), ("All files", "*.*"))
@@ -52,262 +73,314 @@ def select_file():
 
 
 def analyze_file():
-    global filename
-    global numOfUniqueWords
-    global textvariable_numOfSentences, textvariable_numOfAllWords, textvariable_numOfUniqueWords
-    global sentences, allWords, uniqueWords
+    global filename, analysisFuture
+    if analysisFuture is not None and not analysisFuture.done():
+        return  # previous analysis is still running
     clearData()
+    run_button.configure(state="disabled")
+    analysisFuture = analysisExecutor.submit(analyzeText, filename.get())
+    root.after(analysisPollMs, checkAnalysis)
 
-    text = Path(filename.get()).read_text(encoding="utf-8").strip().lower()
-    text = re.sub(r"\n\s+", " ", text)  # remove empty space at the start of lines
 
-    sentences = nltk.sent_tokenize(text, language="english")
-    allWords = nltk.RegexpTokenizer(r"\w+").tokenize(text)
-    allWords.extend(["<s>"] * len(sentences))
-    allWords.extend(["</s>"] * len(sentences))
-    uniqueWords = set([word.lower() for word in allWords if word.isalpha()])
-    uniqueWords.add("<s>")
-    uniqueWords.add("</s>")
+def analyzeText(path):
+    # runs in analysisExecutor, must not touch any Tk object
+    global numOfUniqueWords, numOfAllWords
+    global sentences, sentenceWords, allWords
+
+    text = Path(path).read_text(encoding="utf-8").lower()
+
+    sentences = [
+        " ".join(sen.split()) for sen in sentence_regex.split(text)
+    ]  # collapse line breaks and indentation inside each sentence
+    sentences = [sen for sen in sentences if sen]
+    sentenceWords = [word_regex.findall(sen) for sen in sentences]
+    allWords = list(chain.from_iterable(sentenceWords))
+    numOfAllWords = len(allWords) + 2 * len(sentences)
 
-    findbigrams()
     calculateOccurenceOfWords()
     calculateOccurenceOfBigrams()
+    calculateProbabilities()
+
+
+def checkAnalysis():
+    global tab7Pending
+    if not analysisFuture.done():
+        root.after(analysisPollMs, checkAnalysis)
+        return
+    run_button.configure(state="normal")
+    analysisFuture.result()  # re-raise errors from the worker
 
     fillTab1()
-    fillTab2()
-    fillTab3()
-    fillTab4()
-    fillTab5()
-    fillTab6()
-    fillTab7()
+    for fillTab in (fillTab2, fillTab3, fillTab4, fillTab5, fillTab6):
+        pendingInserts.append(root.after_idle(fillTab))
+    tab7Pending = True
+    fillTab7IfShown()
+
+
+def fillTab7IfShown(event=None):
+    global tab7Pending
+    if tab7Pending and tab_parent.select() == str(tab7):
+        tab7Pending = False
+        pendingInserts.append(root.after_idle(fillTab7))
 
 
 def clearData():
-    global numOfUniqueWords, sentences, allWords, uniqueWords, word_occurence_dict
-    global allBigrams, uniqueBigrams, bigram_occurence_dict
+    global numOfUniqueWords, numOfAllWords
+    global sentences, sentenceWords, allWords
+    global uniqueWords, uniqueWordsList, word_occurence_dict
+    global uniqueBigrams, bigram_occurence_dict, tab7Pending
+    global unigram_prob_dict, unigram_prob_smooth_dict, unseen_unigram_prob_smooth
+    global bigram_prob_dict, bigram_prob_smooth_dict
+    global unseen_bigram_prob_smooth_dict, unseen_context_prob_smooth
     numOfUniqueWords = 0
+    numOfAllWords = 0
     sentences = []
+    sentenceWords = []
     allWords = []
     uniqueWords = set()
+    uniqueWordsList = ()
     word_occurence_dict = {}
-    allBigrams = []
     uniqueBigrams = set()
     bigram_occurence_dict = {}
-    tab2_st.delete("1.0", tk.END)
-    tab3_st.delete("1.0", tk.END)
-    tab4_st.delete("1.0", tk.END)
-    tab5_st.delete("1.0", tk.END)
-    tab6_st.delete("1.0", tk.END)
-    tab7_st.delete("1.0", tk.END)
+    unigram_prob_dict = {}
+    unigram_prob_smooth_dict = {}
+    unseen_unigram_prob_smooth = 0
+    bigram_prob_dict = {}
+    bigram_prob_smooth_dict = {}
+    unseen_bigram_prob_smooth_dict = {}
+    unseen_context_prob_smooth = 0
+    for afterId in pendingInserts:
+        root.after_cancel(afterId)
+    pendingInserts.clear()
+    tab7Pending = False
+    for st in result_texts:
+        st.configure(state="normal")
+        st.delete("1.0", tk.END)
+        st.configure(state="disabled")
+
+
+def insertLines(st, lines, chunkSize=insertChunkLines, start=0):
+    # write a chunk and let Tk handle events before the next one
+    st.configure(state="normal")
+    st.insert(tk.END, "".join(lines[start : start + chunkSize]))
+    st.configure(state="disabled")  # read-only until the next analysis
+    if start + chunkSize < len(lines):
+        pendingInserts.append(
+            root.after(0, insertLines, st, lines, chunkSize, start + chunkSize)
+        )
 
 
 def fillTab1():
     global textvariable_numOfSentences, textvariable_numOfAllWords, textvariable_numOfUniqueWords
     textvariable_numOfSentences.set(str(len(sentences)))
-    textvariable_numOfAllWords.set(str(len(allWords)))
+    textvariable_numOfAllWords.set(str(numOfAllWords))
     textvariable_numOfUniqueWords.set(str(len(uniqueWords)))
 
 
 def fillTab2():
+    lines = []
     for idx, sen in enumerate(sentences):
-        tab2_st.insert(tk.INSERT, str(idx + 1) + " - " + sen + "\n")
+        lines.append(str(idx + 1) + " - " + sen + "\n")
+    insertLines(tab2_st, lines)
 
 
 def fillTab3():
     global word_occurence_dict
-    tab3_st.insert(
-        tk.INSERT, "#" + " - " + "Word" + " \t\t " + "Occurance" + "\t\t" + "P()\n"
-    )
-    for idx, word in enumerate(word_occurence_dict):
-        tab3_st.insert(
-            tk.INSERT,
+    lines = ["#" + " - " + "Word" + " \t\t " + "Occurance" + "\t\t" + "P()\n"]
+    append, probs = lines.append, unigram_prob_dict  # locals for the row loop
+    for idx, (word, count) in enumerate(word_occurence_dict.items()):
+        append(
             str(idx + 1)
             + " - "
             + word
             + " \t\t "
-            + str(word_occurence_dict[word])
+            + str(count)
             + " \t\t "
-            + str(getUnigramProb(word))
-            + "\n",
+            + str(probs[word])
+            + "\n"
         )
+    insertLines(tab3_st, lines)
 
 
 def getUnigramProb(word):
-    return word_occurence_dict[word] / len(allWords)
+    return unigram_prob_dict[word]
 
 
 def fillTab4():
     global word_occurence_dict, bigram_occurence_dict
-    tab4_st.insert(
-        tk.INSERT, "#" + " - " + "Bigram" + " \t\t\t " + "Occurance" + "\t\t" + "P()\n"
-    )
-    for idx, bigram in enumerate(bigram_occurence_dict):
-        tab4_st.insert(
-            tk.INSERT,
+    lines = ["#" + " - " + "Bigram" + " \t\t\t " + "Occurance" + "\t\t" + "P()\n"]
+    append, probs = lines.append, bigram_prob_dict  # locals for the row loop
+    for idx, (bigram, count) in enumerate(bigram_occurence_dict.items()):
+        append(
             str(idx + 1)
             + " - P("
             + bigram[1]
             + "|"
             + bigram[0]
             + ") \t\t\t "
-            + str(bigram_occurence_dict[bigram])
+            + str(count)
             + "\t\t"
-            + str(getBigramProb(bigram))
-            + "\n",
+            + str(probs[bigram])
+            + "\n"
         )
+    insertLines(tab4_st, lines)
 
 
 def getBigramProb(bigram):
-    try:
-        return bigram_occurence_dict[bigram] / word_occurence_dict[bigram[0]]
-    except:
-        print("except getBigramProb", bigram)  # There is key error on dict in one case
-        return 1
+    return bigram_prob_dict.get(bigram, 0.0)
 
 
 def fillTab5():
     global word_occurence_dict
-    tab5_st.insert(
-        tk.INSERT, "#" + " - " + "Word" + " \t\t " + "Occurance" + "\t\t" + "P()\n"
-    )
-    for idx, word in enumerate(word_occurence_dict):
-        tab5_st.insert(
-            tk.INSERT,
+    lines = ["#" + " - " + "Word" + " \t\t " + "Occurance" + "\t\t" + "P()\n"]
+    append, probs = lines.append, unigram_prob_smooth_dict  # locals for the row loop
+    for idx, (word, count) in enumerate(word_occurence_dict.items()):
+        append(
             str(idx + 1)
             + " - "
             + word
             + " \t\t "
-            + str(word_occurence_dict[word])
+            + str(count)
             + " \t\t "
-            + str(getUnigramProbSmooth(word))
-            + "\n",
+            + str(probs[word])
+            + "\n"
         )
+    insertLines(tab5_st, lines)
 
 
 def getUnigramProbSmooth(word):
-    if word in uniqueWords:
-        return (word_occurence_dict[word] + k) / (len(allWords) + k * len(uniqueWords))
-    else:
-        return (0 + k) / (len(allWords) + k * len(uniqueWords))
+    return unigram_prob_smooth_dict.get(word, unseen_unigram_prob_smooth)
 
 
 def fillTab6():
     global word_occurence_dict, bigram_occurence_dict
-    tab6_st.insert(
-        tk.INSERT, "#" + " - " + "Bigram" + " \t\t\t " + "Occurance" + "\t\t" + "P()\n"
-    )
-    for idx, bigram in enumerate(bigram_occurence_dict):
-        tab6_st.insert(
-            tk.INSERT,
+    lines = ["#" + " - " + "Bigram" + " \t\t\t " + "Occurance" + "\t\t" + "P()\n"]
+    append, probs = lines.append, bigram_prob_smooth_dict  # locals for the row loop
+    for idx, (bigram, count) in enumerate(bigram_occurence_dict.items()):
+        append(
             str(idx + 1)
             + " - P("
             + bigram[1]
             + "|"
             + bigram[0]
             + ") \t\t\t "
-            + str(bigram_occurence_dict[bigram])
+            + str(count)
             + "\t\t"
-            + str(getBigramProbSmooth(bigram))
-            + "\n",
+            + str(probs[bigram])
+            + "\n"
         )
+    insertLines(tab6_st, lines)
 
 
 def getBigramProbSmooth(bigram):
-    try:
-        if bigram in bigram_occurence_dict:
-            return (bigram_occurence_dict[bigram] + k) / (
-                word_occurence_dict[bigram[0]] + k * (len(uniqueWords) - 2)
-            )
-        elif bigram[0] in word_occurence_dict:
-            return (0 + k) / (
-                word_occurence_dict[bigram[0]] + k * (len(uniqueWords) - 2)
-            )
-        else:
-            return (0 + k) / (0 + k * (len(uniqueWords) - 2))
-    except:
-        print(
-            "except getBigramProbSmooth", bigram
-        )  # There is key error on dict in one case
-        return 1
+    prob = bigram_prob_smooth_dict.get(bigram)
+    if prob is None:
+        return unseen_bigram_prob_smooth_dict.get(bigram[0], unseen_context_prob_smooth)
+    return prob
 
 
 def fillTab7():
-    str = ""
-    str += "\t"
-    for word2 in uniqueWords:
-        str += word2
-        str += "\t"
+    words = uniqueWordsList
+    wordIndex = {word: idx for idx, word in enumerate(words)}
+    observed = {word: [] for word in words}  # formatted cells of seen bigrams
+    for bigram, prob in bigram_prob_smooth_dict.items():
+        if bigram[0] in observed and bigram[1] in wordIndex:
+            observed[bigram[0]].append((wordIndex[bigram[1]], "%.3f" % prob))
 
-    str += "\n"
+    lines = ["\t" + "\t".join(words) + "\t\n"]
+    for word1 in words:
+        row = ["%.3f" % unseen_bigram_prob_smooth_dict[word1]] * len(words)
+        for idx, cell in observed[word1]:
+            row[idx] = cell
+        lines.append(word1 + "\t" + "\t".join(row) + "\t\n")
+    insertLines(tab7_st, lines, max(1, insertChunkLines // len(words)))
 
-    for word1 in uniqueWords:
-        str += word1
-        str += "\t"
-        for word2 in uniqueWords:
-            str += "%.3f" % getBigramProbSmooth((word1, word2))
-            str += "\t"
-        str += "\n"
-    tab7_st.insert(tk.INSERT, str)
 
+def paddedBigrams(words):
+    return zip(["<s>", *words], [*words, "</s>"])
 
-def findbigrams():
-    global allBigrams, uniqueBigrams
-    for sen in sentences:
-        allBigrams += list(
-            bigrams(
-                pad_both_ends(nltk.RegexpTokenizer(r"\w+").tokenize(sen.lower()), n=2)
-            )
-        )
 
-    uniqueBigrams = set(allBigrams)
+def findbigrams():
+    # generated lazily so the bigrams of the whole corpus are never held in a list
+    return chain.from_iterable(map(paddedBigrams, sentenceWords))
 
 
 def calculateOccurenceOfWords():
-    global word_occurence_dict
+    global word_occurence_dict, uniqueWords, uniqueWordsList
 
-    for wordd in uniqueWords:
-        word_occurence_dict[wordd] = allWords.count(wordd)
+    wordCounter = Counter(allWords)
+    wordCounter["<s>"] = wordCounter["</s>"] = len(sentences)
 
-    word_occurence_dict = dict(
-        sorted(word_occurence_dict.items(), key=lambda item: item[1], reverse=True)
-    )  # sort dictionary based on values
+    word_occurence_dict = {
+        word: count
+        for word, count in wordCounter.most_common()
+        if word.isalpha() or word in ("<s>", "</s>")
+    }  # most_common() is already sorted based on values
+    uniqueWordsList = tuple(word_occurence_dict)
+    uniqueWords = set(uniqueWordsList)
 
 
 def calculateOccurenceOfBigrams():
-    global bigram_occurence_dict
-
-    for bigram in uniqueBigrams:
-        bigram_occurence_dict[bigram] = allBigrams.count(bigram)
+    global bigram_occurence_dict, uniqueBigrams
 
     bigram_occurence_dict = dict(
-        sorted(bigram_occurence_dict.items(), key=lambda item: item[1], reverse=True)
-    )  # sort dictionary based on values
+        Counter(findbigrams()).most_common()
+    )  # most_common() is already sorted based on values
+    uniqueBigrams = set(bigram_occurence_dict)
+
+
+def calculateProbabilities():
+    global unigram_prob_dict, unigram_prob_smooth_dict, unseen_unigram_prob_smooth
+    global bigram_prob_dict, bigram_prob_smooth_dict
+    global unseen_bigram_prob_smooth_dict, unseen_context_prob_smooth
+
+    unigramDenomSmooth = numOfAllWords + k * len(uniqueWords)
+    bigramBaseSmooth = k * (len(uniqueWords) - 2)
+
+    unigram_prob_dict = {
+        word: count / numOfAllWords for word, count in word_occurence_dict.items()
+    }
+    unigram_prob_smooth_dict = {
+        word: (count + k) / unigramDenomSmooth
+        for word, count in word_occurence_dict.items()
+    }
+    unseen_unigram_prob_smooth = k / unigramDenomSmooth
+
+    contextCount = dict(word_occurence_dict)
+    for bigram, count in bigram_occurence_dict.items():
+        if bigram[0] not in word_occurence_dict:  # e.g. numbers
+            contextCount[bigram[0]] = contextCount.get(bigram[0], 0) + count
+
+    contextDenomSmooth = {
+        word: count + bigramBaseSmooth for word, count in contextCount.items()
+    }
+    unseen_bigram_prob_smooth_dict = {
+        word: k / denom for word, denom in contextDenomSmooth.items()
+    }
+    unseen_context_prob_smooth = k / bigramBaseSmooth if bigramBaseSmooth else 1
+
+    bigram_prob_dict = {
+        bigram: count / contextCount[bigram[0]]
+        for bigram, count in bigram_occurence_dict.items()
+    }
+    bigram_prob_smooth_dict = {
+        bigram: (count + k) / contextDenomSmooth[bigram[0]]
+        for bigram, count in bigram_occurence_dict.items()
+    }
 
 
 def find_prob_of_sentence():
     global entry
-    prob = 1
-    detailstr = ""
     string = entry.get()
-    sentenceBigrams = list(
-        bigrams(
-            pad_both_ends(nltk.RegexpTokenizer(r"\w+").tokenize(string.lower()), n=2)
-        )
-    )
-    for big in sentenceBigrams:
-        prob = prob * getBigramProbSmooth(big)
-        detailstr += (
-            "P("
-            + big[1]
-            + "|"
-            + big[0]
-            + ") = "
-            + str(("%.3f" % getBigramProbSmooth(big)))
-            + "\n"
-        )
+    sentenceBigrams = list(paddedBigrams(word_regex.findall(string.lower())))
+    probs = [getBigramProbSmooth(big) for big in sentenceBigrams]
+    details = [
+        "P(" + big[1] + "|" + big[0] + ") = " + "%.3f" % bigProb + "\n"
+        for big, bigProb in zip(sentenceBigrams, probs)
+    ]
 
-    tab8ResultLabel.configure(text=str(prob))
-    tab8DetailsLabel.configure(text=detailstr)
+    tab8ResultLabel.configure(text=str(math.prod(probs)))
+    tab8DetailsLabel.configure(text="".join(details))
 
 
 ############## MAIN ################
@@ -346,6 +419,7 @@ tab7 = ttk.Frame(tab_parent)
 tab8 = ttk.Frame(tab_parent)
 
 tab_parent.grid(column=0, row=2, sticky=tk.NSEW, padx=5, pady=5, columnspan=2)
+tab_parent.bind("<<NotebookTabChanged>>", fillTab7IfShown)
 
 tab_parent.add(tab1, text="Statistics")
 tab_parent.add(tab2, text="Sentences")
@@ -372,29 +446,31 @@ uniqueword_label.grid(column=0, row=2, sticky=tk.NW, padx=5, pady=5)
 uniqueword_label_value.grid(column=1, row=2, sticky=tk.NW, padx=5, pady=5)
 
 # Tab2
-tab2_st = ScrolledText(tab2)
+tab2_st = ScrolledText(tab2, state="disabled")
 tab2_st.pack(fill=tk.BOTH, side=tk.LEFT, expand=True)
 
 # Tab3
-tab3_st = ScrolledText(tab3)
+tab3_st = ScrolledText(tab3, state="disabled")
 tab3_st.pack(fill=tk.BOTH, side=tk.LEFT, expand=True)
 
 # Tab4
-tab4_st = ScrolledText(tab4)
+tab4_st = ScrolledText(tab4, state="disabled")
 tab4_st.pack(fill=tk.BOTH, side=tk.LEFT, expand=True)
 
 # Tab5
-tab5_st = ScrolledText(tab5)
+tab5_st = ScrolledText(tab5, state="disabled")
 tab5_st.pack(fill=tk.BOTH, side=tk.LEFT, expand=True)
 
 # Tab6
-tab6_st = ScrolledText(tab6)
+tab6_st = ScrolledText(tab6, state="disabled")
 tab6_st.pack(fill=tk.BOTH, side=tk.LEFT, expand=True)
 
 # Tab7
-tab7_st = ScrolledText(tab7)
+tab7_st = ScrolledText(tab7, state="disabled")
 tab7_st.pack(fill=tk.BOTH, side=tk.LEFT, expand=True)
 
+result_texts = (tab2_st, tab3_st, tab4_st, tab5_st, tab6_st, tab7_st)
+
 # Tab8
 labela = tk.Label(tab8, text="Enter your sentence:", font=("Courier 15"))
 labela.pack(pady=20)